@@ -174,6 +174,9 @@ class LdapSource(source.Source):
         self._SetDefaults(conf)
         self._conf = conf
         self.ldap_controls = makeSimplePagedResultsControl(self.PAGE_SIZE)
+        # The paged results control is reused across searches; only its cookie
+        # changes between pages, so the serverctrls list is built once too.
+        self._serverctrls = [self.ldap_controls]
 
         # Used by _ReSearch:
         self._last_search_params = None
@@ -340,7 +343,7 @@ class LdapSource(source.Source):
             filterstr=search_filter,
             scope=search_scope,
             attrlist=attrs,
-            serverctrls=[self.ldap_controls],
+            serverctrls=self._serverctrls,
         )
 
     def __iter__(self):
@@ -990,24 +993,27 @@ class GroupUpdateGetter(UpdateGetter):
 
         def _expand_members(obj, visited=None):
             """Expand all subgroups recursively."""
+            # members stays an ordered list; track it in a set for O(1) dedup.
+            known_members = set(obj.members)
             for member_name in obj.groupmembers:
                 if member_name in _group_map and member_name not in visited:
                     gmember = _group_map[member_name]
                     for member in gmember.members:
-                        if member not in obj.members:
+                        if member not in known_members:
+                            known_members.add(member)
                             obj.members.append(member)
                     for submember_name in gmember.groupmembers:
                         if (
                             submember_name in _group_map
                             and submember_name not in visited
                         ):
-                            visited.append(submember_name)
+                            visited.add(submember_name)
                             _expand_members(_group_map[submember_name], visited)
 
         if self.conf.get("nested_groups"):
             self.log.info("Expanding nested groups")
             for gr in data_map:
-                _expand_members(gr, [gr.name])
+                _expand_members(gr, {gr.name})
 
 
 class ShadowUpdateGetter(UpdateGetter):
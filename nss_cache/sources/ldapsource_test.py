@@ -20,11 +20,18 @@ __author__ = (
     "vasilios@google.com (Vasilios Hoffman)",
 )
 
+import copy
 import time
+import types
 import unittest
-import ldap
 from unittest import mock
 
+try:
+    import ldap
+except ImportError:
+    # Skip the whole module rather than failing collection of the suite.
+    raise unittest.SkipTest("python-ldap is not installed")
+
 from nss_cache import error
 from nss_cache.maps import automount
 from nss_cache.maps import group
@@ -32,46 +39,242 @@ from nss_cache.maps import passwd
 from nss_cache.maps import shadow
 from nss_cache.sources import ldapsource
 
+# Bound once rather than looked up on the ldap module in every test.
+RES_SEARCH_ENTRY = ldap.RES_SEARCH_ENTRY
+RES_SEARCH_RESULT = ldap.RES_SEARCH_RESULT
+SCOPE_BASE = ldap.SCOPE_BASE
+SCOPE_ONELEVEL = ldap.SCOPE_ONELEVEL
+SCOPE_SUBTREE = ldap.SCOPE_SUBTREE
+
 TEST_RETRY_MAX = 1
 TEST_RETRY_DELAY = 0
 TEST_URI = "TEST_URI"
 
+# Read-only so that LdapSource._SetDefaults can never write into the shared
+# fixture; tests work on a dict copy of it.
+TEST_CONFIG = types.MappingProxyType(
+    {
+        "uri": TEST_URI,
+        "base": "TEST_BASE",
+        "filter": "TEST_FILTER",
+        "bind_dn": "TEST_BIND_DN",
+        "bind_password": "TEST_BIND_PASSWORD",
+        "retry_delay": TEST_RETRY_DELAY,
+        "retry_max": TEST_RETRY_MAX,
+        "timelimit": "TEST_TIMELIMIT",
+        "tls_require_cert": 0,
+        "tls_cacertdir": "TEST_TLS_CACERTDIR",
+        "tls_cacertfile": "TEST_TLS_CACERTFILE",
+    }
+)
 
-class TestLdapSource(unittest.TestCase):
-    def setUp(self):
-        """Initialize a basic config dict."""
-        super(TestLdapSource, self).setUp()
-        self.config = {
-            "uri": "TEST_URI",
-            "base": "TEST_BASE",
-            "filter": "TEST_FILTER",
-            "bind_dn": "TEST_BIND_DN",
-            "bind_password": "TEST_BIND_PASSWORD",
-            "retry_delay": TEST_RETRY_DELAY,
-            "retry_max": TEST_RETRY_MAX,
-            "timelimit": "TEST_TIMELIMIT",
-            "tls_require_cert": 0,
-            "tls_cacertdir": "TEST_TLS_CACERTDIR",
-            "tls_cacertfile": "TEST_TLS_CACERTFILE",
-        }
-        ldap_patcher = mock.patch.object(ldap, "ldapobject", autospec=True)
-        self.addCleanup(ldap_patcher.stop)
-        self.ldap_mock = ldap_patcher.start()
+# Attributes requested by each UpdateGetter, before the timestamp attribute.
+PASSWD_ATTRS = (
+    "uid",
+    "uidNumber",
+    "gidNumber",
+    "gecos",
+    "cn",
+    "homeDirectory",
+    "loginShell",
+    "fullName",
+)
+AD_PASSWD_ATTRS = (
+    "sAMAccountName",
+    "objectSid",
+    "displayName",
+    "unixHomeDirectory",
+    "pwdLastSet",
+    "loginShell",
+)
+GROUP_ATTRS = ("cn", "gidNumber", "memberUid", "uid")
+GROUP_BIS_ATTRS = ("cn", "gidNumber", "member", "uid")
+GROUP_BIS_ALT_ATTRS = ("cn", "gidNumber", "uniqueMember", "uid")
+AD_GROUP_ATTRS = ("sAMAccountName", "member", "objectSid")
+SHADOW_ATTRS = (
+    "uid",
+    "shadowLastChange",
+    "shadowMin",
+    "shadowMax",
+    "shadowWarning",
+    "shadowInactive",
+    "shadowExpire",
+    "shadowFlag",
+    "userPassword",
+)
+NETGROUP_ATTRS = ("cn", "memberNisNetgroup", "nisNetgroupTriple")
+AUTOMOUNT_ATTRS = ("cn", "automountInformation")
+
+
+# LDAP entries shared by several tests.  LdapSource decodes bytes values in
+# place, so searches are always handed a copy (see _SetSearchResults).
+TEST_POSIX_ACCOUNT = (
+    "cn=test,ou=People,dc=example,dc=com",
+    {
+        "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
+        "uidNumber": ["1000"],
+        "gidNumber": ["1000"],
+        "uid": ["test"],
+        "name": ["test"],
+        "cn": ["Testguy McTest"],
+        "homeDirectory": ["/home/test"],
+        "loginShell": ["/bin/sh"],
+        "userPassword": ["p4ssw0rd"],
+        "modifyTimestamp": ["20070227012807Z"],
+    },
+)
+
+TEST_AD_ACCOUNT = (
+    "cn=test,ou=People,dc=example,dc=com",
+    {
+        "objectSid": [
+            b"\x01\x05\x00\x00\x00\x00\x00\x05\x15\x00\x00\x00\xa0e\xcf~xK\x9b_\xe7|\x87p\t\x1c\x01\x00"
+        ],
+        "sAMAccountName": ["test"],
+        "displayName": ["Testguy McTest"],
+        "unixHomeDirectory": ["/home/test"],
+        "loginShell": ["/bin/sh"],
+        "pwdLastSet": ["132161071270000000"],
+        "whenChanged": ["20070227012807.0Z"],
+    },
+)
+
+TEST_POSIX_GROUP = (
+    "cn=test,ou=Group,dc=example,dc=com",
+    {
+        "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
+        "gidNumber": [1000],
+        "cn": ["testgroup"],
+        "memberUid": ["testguy", "fooguy", "barguy"],
+        "modifyTimestamp": ["20070227012807Z"],
+    },
+)
+
+TEST_NESTED_GROUP = (
+    "cn=test,ou=Group,dc=example,dc=com",
+    {
+        "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
+        "gidNumber": [1000],
+        "cn": ["testgroup"],
+        "member": [
+            "cn=testguy,ou=People,dc=example,dc=com",
+            "cn=fooguy,ou=People,dc=example,dc=com",
+            "cn=barguy,ou=People,dc=example,dc=com",
+            "cn=child,ou=Group,dc=example,dc=com",
+        ],
+        "modifyTimestamp": ["20070227012807Z"],
+    },
+)
+
+TEST_CHILD_GROUP = (
+    "cn=child,ou=Group,dc=example,dc=com",
+    {
+        "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72714"],
+        "gidNumber": [1001],
+        "cn": ["child"],
+        "member": [
+            "cn=newperson,ou=People,dc=example,dc=com",
+            "cn=fooperson,ou=People,dc=example,dc=com",
+            "cn=barperson,ou=People,dc=example,dc=com",
+        ],
+        "modifyTimestamp": ["20070227012807Z"],
+    },
+)
+
+TEST_LOOP_GROUP = (
+    "cn=loop,ou=Group,dc=example,dc=com",
+    {
+        "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72715"],
+        "gidNumber": [1002],
+        "cn": ["loop"],
+        "member": [
+            "cn=loopperson,ou=People,dc=example,dc=com",
+            "cn=testgroup,ou=Group,dc=example,dc=com",
+        ],
+        "modifyTimestamp": ["20070227012807Z"],
+    },
+)
+
+TEST_SHADOW = (
+    "cn=test,ou=People,dc=example,dc=com",
+    {
+        "uid": ["test"],
+        "name": ["test"],
+        "shadowLastChange": ["11296"],
+        "shadowMax": ["99999"],
+        "shadowWarning": ["7"],
+        "shadowInactive": ["-1"],
+        "shadowExpire": ["-1"],
+        "shadowFlag": ["134537556"],
+        "modifyTimestamp": ["20070227012807Z"],
+        "userPassword": ["{CRYPT}p4ssw0rd"],
+    },
+)
 
-    class compareSPRC:
-        def __init__(self, expected_value=""):
-            self.expected_value = expected_value
 
-        def __eq__(self, other):
-            if not isinstance(other, list):
-                return False
+class compareSPRC:
+    def __init__(self, expected_value=""):
+        self.expected_value = expected_value
 
-            sprc = other[0]
-            if not isinstance(sprc, ldap.controls.SimplePagedResultsControl):
-                return False
+    def __eq__(self, other):
+        if not isinstance(other, list):
+            return False
 
-            cookie = ldapsource.getCookieFromControl(sprc)
-            return cookie == self.expected_value
+        sprc = other[0]
+        if not isinstance(sprc, ldap.controls.SimplePagedResultsControl):
+            return False
+
+        cookie = ldapsource.getCookieFromControl(sprc)
+        return cookie == self.expected_value
+
+
+# Matches the serverctrls of a search with a reset (empty) paging cookie.
+SPRC_MATCHER = compareSPRC()
+
+
+class TestLdapSource(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Patch ldap.ldapobject once for the whole class."""
+        super(TestLdapSource, cls).setUpClass()
+        # Autospeccing the module is the expensive part, so share the mock and
+        # reset it between tests instead of rebuilding it each time.  spec_set
+        # makes configuring a method ReconnectLDAPObject lacks an error.
+        ldap_patcher = mock.patch.object(
+            ldap, "ldapobject", autospec=True, spec_set=True
+        )
+        cls.ldap_mock = ldap_patcher.start()
+        cls.addClassCleanup(ldap_patcher.stop)
+
+    def setUp(self):
+        """Initialize a basic config dict and reset the shared ldap mock."""
+        super(TestLdapSource, self).setUp()
+        self.config = dict(TEST_CONFIG)
+        self.ldap_mock.reset_mock()
+        # The connection object every LdapSource in these tests talks to.
+        self.conn = self.ldap_mock.ReconnectLDAPObject.return_value
+        # Return values and side effects configured on the connection by a
+        # previous test must not leak into this one.
+        self.conn.reset_mock(return_value=True, side_effect=True)
+
+    def _SetSearchResults(self, *pages):
+        """Queue result3 replies for one search per page of entries."""
+        results = []
+        for entries in pages:
+            # Copied so that in-place decoding can't leak between tests.
+            results.append((RES_SEARCH_ENTRY, copy.deepcopy(entries), None, []))
+            results.append((RES_SEARCH_RESULT, None, None, []))
+        self.conn.result3.side_effect = results
+
+    def _AssertSearched(self, attrlist, filterstr=mock.ANY, scope=mock.ANY):
+        """Assert the last search_ext call asked for attrlist."""
+        self.conn.search_ext.assert_called_with(
+            base=mock.ANY,
+            filterstr=filterstr,
+            scope=scope,
+            attrlist=list(attrlist),
+            serverctrls=SPRC_MATCHER,
+        )
 
     def testDefaultConfiguration(self):
         config = {"uri": "ldap://foo"}
@@ -87,14 +290,14 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(source.conf["scope"], ldapsource.LdapSource.SCOPE)
         self.assertEqual(source.conf["timelimit"], ldapsource.LdapSource.TIMELIMIT)
         self.assertEqual(source.conf["tls_require_cert"], ldap.OPT_X_TLS_DEMAND)
+        self.conn.simple_bind_s.assert_called_once_with(who="", cred="")
 
     def testOverrideDefaultConfiguration(self):
-        config = dict(self.config)
-        config["scope"] = ldap.SCOPE_BASE
+        config = {**self.config, "scope": SCOPE_BASE}
 
         source = ldapsource.LdapSource(config)
 
-        self.assertEqual(source.conf["scope"], ldap.SCOPE_BASE)
+        self.assertEqual(source.conf["scope"], SCOPE_BASE)
         self.assertEqual(source.conf["bind_dn"], "TEST_BIND_DN")
         self.assertEqual(source.conf["bind_password"], "TEST_BIND_PASSWORD")
         self.assertEqual(source.conf["retry_delay"], TEST_RETRY_DELAY)
@@ -103,30 +306,34 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(source.conf["tls_require_cert"], 0)
         self.assertEqual(source.conf["tls_cacertdir"], "TEST_TLS_CACERTDIR")
         self.assertEqual(source.conf["tls_cacertfile"], "TEST_TLS_CACERTFILE")
+        self.conn.simple_bind_s.assert_called_once_with(
+            who="TEST_BIND_DN", cred="TEST_BIND_PASSWORD"
+        )
 
     def testDebugLevelSet(self):
-        config = dict(self.config)
-        config["ldap_debug"] = 3
+        config = {**self.config, "ldap_debug": 3}
 
         ldapsource.LdapSource(config)
 
-        self.ldap_mock.ReconnectLDAPObject.return_value.set_option.assert_called_with(
-            ldap.OPT_DEBUG_LEVEL, 3
-        )
+        self.conn.set_option.assert_called_with(ldap.OPT_DEBUG_LEVEL, 3)
 
     def testTrapServerDownAndRetry(self):
-        config = dict(self.config)
-        config["bind_dn"] = ""
-        config["bind_password"] = ""
-        config["retry_delay"] = 5
-        config["retry_max"] = 3
-        self.ldap_mock.ReconnectLDAPObject.return_value.simple_bind_s.side_effect = (
-            ldap.SERVER_DOWN
-        )
+        config = {
+            **self.config,
+            "bind_dn": "",
+            "bind_password": "",
+            "retry_delay": 5,
+            "retry_max": 3,
+        }
+        self.conn.simple_bind_s.side_effect = ldap.SERVER_DOWN
 
-        with mock.patch("time.sleep"):
+        with mock.patch.object(ldapsource.time, "sleep") as sleep_mock:
             self.assertRaises(error.SourceUnavailable, ldapsource.LdapSource, config)
 
+        # retry_max attempts means retry_max - 1 sleeps between them.
+        self.assertEqual(
+            [mock.call(5)] * (config["retry_max"] - 1), sleep_mock.call_args_list
+        )
         self.ldap_mock.ReconnectLDAPObject.assert_called_with(
             mock.ANY, retry_max=3, retry_delay=5
         )
@@ -134,10 +341,7 @@ class TestLdapSource(unittest.TestCase):
     def testIterationOverLdapDataSource(self):
         config = dict(self.config)
         dataset = [("dn", {"uid": [0]})]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, dataset, None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        self._SetSearchResults(dataset)
 
         source = ldapsource.LdapSource(config)
         source.Search(
@@ -153,14 +357,10 @@ class TestLdapSource(unittest.TestCase):
             count += 1
         self.assertEqual(1, count)
 
-    @mock.patch("time.sleep")
-    def testIterationTimeout(self, unused_time_mock):
-        config = dict(self.config)
-        config["retry_delay"] = 5
-        config["retry_max"] = 3
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = (
-            ldap.TIMELIMIT_EXCEEDED
-        )
+    @mock.patch.object(ldapsource.time, "sleep")
+    def testIterationTimeout(self, sleep_mock):
+        config = {**self.config, "retry_delay": 5, "retry_max": 3}
+        self.conn.result3.side_effect = ldap.TIMELIMIT_EXCEEDED
 
         source = ldapsource.LdapSource(config)
         source.Search(
@@ -174,220 +374,36 @@ class TestLdapSource(unittest.TestCase):
         for r in source:
             count += 1
         self.assertEqual(0, count)
-
-    def testGetPasswdMap(self):
-        test_posix_account = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "uidNumber": ["1000"],
-                "gidNumber": ["1000"],
-                "uid": ["test"],
-                "cn": ["Testguy McTest"],
-                "homeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "userPassword": ["p4ssw0rd"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        attrlist = [
-            "uid",
-            "uidNumber",
-            "gidNumber",
-            "gecos",
-            "cn",
-            "homeDirectory",
-            "fullName",
-            "loginShell",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
-
-        source = ldapsource.LdapSource(config)
-        data = source.GetPasswdMap()
-
-        self.assertEqual(1, len(data))
-        first = data.PopItem()
-        self.assertEqual("test", first.name)
-
-    def testGetPasswdMapWithUidAttr(self):
-        test_posix_account = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "uidNumber": [1000],
-                "gidNumber": [1000],
-                "uid": ["test"],
-                "name": ["test"],
-                "cn": ["Testguy McTest"],
-                "homeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "userPassword": ["p4ssw0rd"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        config["uidattr"] = "name"
-        attrlist = [
-            "uid",
-            "uidNumber",
-            "gidNumber",
-            "gecos",
-            "cn",
-            "homeDirectory",
-            "loginShell",
-            "fullName",
-            "name",
-            "modifyTimestamp",
-        ]
-
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
-        source = ldapsource.LdapSource(config)
-        data = source.GetPasswdMap()
-
-        self.assertEqual(1, len(data))
-        first = data.PopItem()
-        self.assertEqual("test", first.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
-
-    def testGetPasswdMapWithShellOverride(self):
-        test_posix_account = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "uidNumber": [1000],
-                "gidNumber": [1000],
-                "uid": ["test"],
-                "cn": ["Testguy McTest"],
-                "homeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "userPassword": ["p4ssw0rd"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        config["override_shell"] = "/bin/false"
-        attrlist = [
-            "uid",
-            "uidNumber",
-            "gidNumber",
-            "gecos",
-            "cn",
-            "homeDirectory",
-            "loginShell",
-            "fullName",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
-
-        source = ldapsource.LdapSource(config)
-        data = source.GetPasswdMap()
-
-        self.assertEqual(1, len(data))
-        first = data.PopItem()
-        self.assertEqual("/bin/false", first.shell)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
-
-    def testGetPasswdMapWithUseRid(self):
-        test_posix_account = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "uidNumber": [1000],
-                "gidNumber": [1000],
-                "uid": ["test"],
-                "cn": ["Testguy McTest"],
-                "homeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "userPassword": ["p4ssw0rd"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
+        self.assertEqual(
+            [mock.call(5)] * (config["retry_max"] - 1), sleep_mock.call_args_list
         )
-        config = dict(self.config)
-        config["use_rid"] = "1"
-        attrlist = [
-            "uid",
-            "uidNumber",
-            "gidNumber",
-            "gecos",
-            "cn",
-            "homeDirectory",
-            "loginShell",
-            "fullName",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
-
-        source = ldapsource.LdapSource(config)
-        data = source.GetPasswdMap()
 
-        self.assertEqual(1, len(data))
-        first = data.PopItem()
-        self.assertEqual("test", first.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+    def testGetPasswdMap(self):
+        # config overrides, extra attributes requested, entry field, value.
+        cases = (
+            ({}, (), "name", "test"),
+            ({"uidattr": "name"}, ("name",), "name", "test"),
+            ({"override_shell": "/bin/false"}, (), "shell", "/bin/false"),
+            ({"use_rid": "1"}, ("sambaSID",), "name", "test"),
+        )
+        for overrides, extra_attrs, field, expected in cases:
+            with self.subTest(config=overrides):
+                config = {**self.config, **overrides}
+                attrlist = PASSWD_ATTRS + extra_attrs + ("modifyTimestamp",)
+                self._SetSearchResults([TEST_POSIX_ACCOUNT])
+
+                source = ldapsource.LdapSource(config)
+                data = source.GetPasswdMap()
+
+                self.assertEqual(1, len(data))
+                first = data.PopItem()
+                self.assertEqual(expected, getattr(first, field))
+                self._AssertSearched(attrlist)
 
     def testGetPasswdMapAD(self):
-        test_posix_account = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "objectSid": [
-                    b"\x01\x05\x00\x00\x00\x00\x00\x05\x15\x00\x00\x00\xa0e\xcf~xK\x9b_\xe7|\x87p\t\x1c\x01\x00"
-                ],
-                "sAMAccountName": ["test"],
-                "displayName": ["Testguy McTest"],
-                "unixHomeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "pwdLastSet": ["132161071270000000"],
-                "whenChanged": ["20070227012807.0Z"],
-            },
-        )
-        config = dict(self.config)
-        config["ad"] = "1"
-        attrlist = [
-            "sAMAccountName",
-            "objectSid",
-            "displayName",
-            "unixHomeDirectory",
-            "pwdLastSet",
-            "loginShell",
-            "whenChanged",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "ad": "1"}
+        attrlist = AD_PASSWD_ATTRS + ("whenChanged",)
+        self._SetSearchResults([TEST_AD_ACCOUNT])
 
         source = ldapsource.LdapSource(config)
         data = source.GetPasswdMap()
@@ -395,46 +411,12 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(1, len(data))
         first = data.PopItem()
         self.assertEqual("test", first.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetPasswdMapADWithOffset(self):
-        test_posix_account = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "objectSid": [
-                    b"\x01\x05\x00\x00\x00\x00\x00\x05\x15\x00\x00\x00\xa0e\xcf~xK\x9b_\xe7|\x87p\t\x1c\x01\x00"
-                ],
-                "sAMAccountName": ["test"],
-                "displayName": ["Testguy McTest"],
-                "unixHomeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "pwdLastSet": ["132161071270000000"],
-                "whenChanged": ["20070227012807.0Z"],
-            },
-        )
-
-        config = dict(self.config)
-        config["ad"] = "1"
-        config["offset"] = 10000
-        attrlist = [
-            "sAMAccountName",
-            "objectSid",
-            "displayName",
-            "unixHomeDirectory",
-            "pwdLastSet",
-            "loginShell",
-            "whenChanged",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "ad": "1", "offset": 10000}
+        attrlist = AD_PASSWD_ATTRS + ("whenChanged",)
+        self._SetSearchResults([TEST_AD_ACCOUNT])
 
         source = ldapsource.LdapSource(config)
         data = source.GetPasswdMap()
@@ -442,31 +424,12 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(1, len(data))
         first = data.PopItem()
         self.assertEqual("test", first.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupMap(self):
-        test_posix_group = (
-            "cn=test,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "gidNumber": [1000],
-                "cn": ["testgroup"],
-                "memberUid": ["testguy", "fooguy", "barguy"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
         config = dict(self.config)
-        attrlist = ["cn", "gidNumber", "memberUid", "uid", "modifyTimestamp"]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        attrlist = GROUP_ATTRS + ("modifyTimestamp",)
+        self._SetSearchResults([TEST_POSIX_GROUP])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -474,39 +437,12 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(1, len(data))
         ent = data.PopItem()
         self.assertEqual("testgroup", ent.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupMapWithUseRid(self):
-        test_posix_group = (
-            "cn=test,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "gidNumber": [1000],
-                "cn": ["testgroup"],
-                "memberUid": ["testguy", "fooguy", "barguy"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        config["use_rid"] = "1"
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "memberUid",
-            "uid",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "use_rid": "1"}
+        attrlist = GROUP_ATTRS + ("sambaSID", "modifyTimestamp")
+        self._SetSearchResults([TEST_POSIX_GROUP])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -514,43 +450,12 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(1, len(data))
         ent = data.PopItem()
         self.assertEqual("testgroup", ent.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupMapAsUser(self):
-        test_posix_group = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "uidNumber": [1000],
-                "gidNumber": [1000],
-                "uid": ["test"],
-                "cn": ["Testguy McTest"],
-                "homeDirectory": ["/home/test"],
-                "loginShell": ["/bin/sh"],
-                "userPassword": ["p4ssw0rd"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        config["use_rid"] = "1"
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "memberUid",
-            "uid",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "use_rid": "1"}
+        attrlist = GROUP_ATTRS + ("sambaSID", "modifyTimestamp")
+        self._SetSearchResults([TEST_POSIX_ACCOUNT])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -558,13 +463,7 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(1, len(data))
         ent = data.PopItem()
         self.assertEqual("test", ent.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupMapAD(self):
         test_posix_group = (
@@ -583,18 +482,9 @@ class TestLdapSource(unittest.TestCase):
                 "whenChanged": ["20070227012807.0Z"],
             },
         )
-        config = dict(self.config)
-        config["ad"] = "1"
-        attrlist = [
-            "sAMAccountName",
-            "member",
-            "objectSid",
-            "whenChanged",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "ad": "1"}
+        attrlist = AD_GROUP_ATTRS + ("whenChanged",)
+        self._SetSearchResults([test_posix_group])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -602,13 +492,7 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(1, len(data))
         ent = data.PopItem()
         self.assertEqual("testgroup", ent.name)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupMapBis(self):
         test_posix_group = (
@@ -625,19 +509,9 @@ class TestLdapSource(unittest.TestCase):
                 "modifyTimestamp": ["20070227012807Z"],
             },
         )
-        config = dict(self.config)
-        config["rfc2307bis"] = 1
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "member",
-            "uid",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "rfc2307bis": 1}
+        attrlist = GROUP_BIS_ATTRS + ("modifyTimestamp",)
+        self._SetSearchResults([test_posix_group])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -646,57 +520,12 @@ class TestLdapSource(unittest.TestCase):
         ent = data.PopItem()
         self.assertEqual("testgroup", ent.name)
         self.assertEqual(3, len(ent.members))
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupNestedNotConfigured(self):
-        test_posix_group = (
-            "cn=test,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "gidNumber": [1000],
-                "cn": ["testgroup"],
-                "member": [
-                    "cn=testguy,ou=People,dc=example,dc=com",
-                    "cn=fooguy,ou=People,dc=example,dc=com",
-                    "cn=barguy,ou=People,dc=example,dc=com",
-                    "cn=child,ou=Group,dc=example,dc=com",
-                ],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        test_child_group = (
-            "cn=child,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72714"],
-                "gidNumber": [1001],
-                "cn": ["child"],
-                "member": [
-                    "cn=newperson,ou=People,dc=example,dc=com",
-                    "cn=fooperson,ou=People,dc=example,dc=com",
-                    "cn=barperson,ou=People,dc=example,dc=com",
-                ],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        config["rfc2307bis"] = 1
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "member",
-            "uid",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group, test_child_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "rfc2307bis": 1}
+        attrlist = GROUP_BIS_ATTRS + ("modifyTimestamp",)
+        self._SetSearchResults([TEST_NESTED_GROUP, TEST_CHILD_GROUP])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -708,60 +537,12 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(len(datadict["testgroup"].members), 4)
         self.assertEqual(len(datadict["child"].members), 3)
         self.assertNotIn("newperson", datadict["testgroup"].members)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupNested(self):
-        test_posix_group = (
-            "cn=test,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "gidNumber": [1000],
-                "cn": ["testgroup"],
-                "member": [
-                    "cn=testguy,ou=People,dc=example,dc=com",
-                    "cn=fooguy,ou=People,dc=example,dc=com",
-                    "cn=barguy,ou=People,dc=example,dc=com",
-                    "cn=child,ou=Group,dc=example,dc=com",
-                ],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        test_child_group = (
-            "cn=child,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72714"],
-                "gidNumber": [1001],
-                "cn": ["child"],
-                "member": [
-                    "cn=newperson,ou=People,dc=example,dc=com",
-                    "cn=fooperson,ou=People,dc=example,dc=com",
-                    "cn=barperson,ou=People,dc=example,dc=com",
-                ],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        config["rfc2307bis"] = 1
-        config["nested_groups"] = 1
-        config["use_rid"] = 1
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "member",
-            "uid",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group, test_child_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "rfc2307bis": 1, "nested_groups": 1, "use_rid": 1}
+        attrlist = GROUP_BIS_ATTRS + ("sambaSID", "modifyTimestamp")
+        self._SetSearchResults([TEST_NESTED_GROUP, TEST_CHILD_GROUP])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -773,82 +554,44 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(len(datadict["testgroup"].members), 7)
         self.assertEqual(len(datadict["child"].members), 3)
         self.assertIn("newperson", datadict["testgroup"].members)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
-    def testGetGroupLoop(self):
-        test_posix_group = (
-            "cn=test,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72713"],
-                "gidNumber": [1000],
-                "cn": ["testgroup"],
-                "member": [
-                    "cn=testguy,ou=People,dc=example,dc=com",
-                    "cn=fooguy,ou=People,dc=example,dc=com",
-                    "cn=barguy,ou=People,dc=example,dc=com",
-                    "cn=child,ou=Group,dc=example,dc=com",
-                ],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        test_child_group = (
+    def testGetGroupNestedSharedMember(self):
+        config = {**self.config, "rfc2307bis": 1, "nested_groups": 1, "use_rid": 1}
+        attrlist = GROUP_BIS_ATTRS + ("sambaSID", "modifyTimestamp")
+        # A child group that also lists one of its parent's direct members.
+        child_group = (
             "cn=child,ou=Group,dc=example,dc=com",
             {
                 "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72714"],
                 "gidNumber": [1001],
                 "cn": ["child"],
                 "member": [
+                    "cn=fooguy,ou=People,dc=example,dc=com",
                     "cn=newperson,ou=People,dc=example,dc=com",
-                    "cn=fooperson,ou=People,dc=example,dc=com",
-                    "cn=barperson,ou=People,dc=example,dc=com",
                 ],
                 "modifyTimestamp": ["20070227012807Z"],
             },
         )
-        test_loop_group = (
-            "cn=loop,ou=Group,dc=example,dc=com",
-            {
-                "sambaSID": ["S-1-5-21-2127521184-1604012920-1887927527-72715"],
-                "gidNumber": [1002],
-                "cn": ["loop"],
-                "member": [
-                    "cn=loopperson,ou=People,dc=example,dc=com",
-                    "cn=testgroup,ou=Group,dc=example,dc=com",
-                ],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
+        self._SetSearchResults([TEST_NESTED_GROUP, child_group])
+
+        source = ldapsource.LdapSource(config)
+        data = source.GetGroupMap()
+
+        datadict = {i.name: i for i in data}
+        # fooguy appears once, and the child's other member follows the
+        # parent's own members.
+        self.assertEqual(
+            ["barguy", "child", "fooguy", "testguy", "newperson"],
+            datadict["testgroup"].members,
         )
-        config = dict(self.config)
-        config["rfc2307bis"] = 1
-        config["nested_groups"] = 1
-        config["use_rid"] = 1
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "member",
-            "uid",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (
-                ldap.RES_SEARCH_ENTRY,
-                [
-                    test_posix_group,
-                    test_child_group,
-                    test_loop_group,
-                ],
-                None,
-                [],
-            ),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        self.assertEqual(["fooguy", "newperson"], datadict["child"].members)
+        self._AssertSearched(attrlist)
+
+    def testGetGroupLoop(self):
+        config = {**self.config, "rfc2307bis": 1, "nested_groups": 1, "use_rid": 1}
+        attrlist = GROUP_BIS_ATTRS + ("sambaSID", "modifyTimestamp")
+        self._SetSearchResults([TEST_NESTED_GROUP, TEST_CHILD_GROUP, TEST_LOOP_GROUP])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -860,13 +603,7 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual(len(datadict["testgroup"].members), 7)
         self.assertEqual(len(datadict["child"].members), 3)
         self.assertIn("newperson", datadict["testgroup"].members)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetGroupMapBisAlt(self):
         test_posix_group = (
@@ -895,24 +632,10 @@ class TestLdapSource(unittest.TestCase):
             },
         )
 
-        config = dict(self.config)
-        config["rfc2307bis_alt"] = 1
-        config["use_rid"] = 1
-        attrlist = [
-            "cn",
-            "gidNumber",
-            "uniqueMember",
-            "uid",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
+        config = {**self.config, "rfc2307bis_alt": 1, "use_rid": 1}
+        attrlist = GROUP_BIS_ALT_ATTRS + ("sambaSID", "modifyTimestamp")
         uidattr = ["uid"]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_group], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-            (ldap.RES_SEARCH_ENTRY, [test_posix_account], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        self._SetSearchResults([test_posix_group], [test_posix_account])
 
         source = ldapsource.LdapSource(config)
         data = source.GetGroupMap()
@@ -921,57 +644,29 @@ class TestLdapSource(unittest.TestCase):
         ent = data.PopItem()
         self.assertEqual("testgroup", ent.name)
         self.assertEqual(1, len(ent.members))
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_has_calls(
+        self.conn.search_ext.assert_has_calls(
             [
                 mock.call(
                     base=mock.ANY,
                     filterstr=mock.ANY,
                     scope=mock.ANY,
-                    attrlist=attrlist,
-                    serverctrls=self.compareSPRC(),
+                    attrlist=list(attrlist),
+                    serverctrls=SPRC_MATCHER,
                 ),
                 mock.call(
                     base=dn_user,
                     filterstr="(objectClass=*)",
                     scope=mock.ANY,
                     attrlist=uidattr,
-                    serverctrls=self.compareSPRC(),
+                    serverctrls=SPRC_MATCHER,
                 ),
             ]
         )
 
     def testGetShadowMap(self):
-        test_shadow = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "uid": ["test"],
-                "shadowLastChange": ["11296"],
-                "shadowMax": ["99999"],
-                "shadowWarning": ["7"],
-                "shadowInactive": ["-1"],
-                "shadowExpire": ["-1"],
-                "shadowFlag": ["134537556"],
-                "modifyTimestamp": ["20070227012807Z"],
-                "userPassword": ["{CRYPT}p4ssw0rd"],
-            },
-        )
         config = dict(self.config)
-        attrlist = [
-            "uid",
-            "shadowLastChange",
-            "shadowMin",
-            "shadowMax",
-            "shadowWarning",
-            "shadowInactive",
-            "shadowExpire",
-            "shadowFlag",
-            "userPassword",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_shadow], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        attrlist = SHADOW_ATTRS + ("modifyTimestamp",)
+        self._SetSearchResults([TEST_SHADOW])
 
         source = ldapsource.LdapSource(config)
         data = source.GetShadowMap()
@@ -980,49 +675,12 @@ class TestLdapSource(unittest.TestCase):
         ent = data.PopItem()
         self.assertEqual("test", ent.name)
         self.assertEqual("p4ssw0rd", ent.passwd)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetShadowMapWithUidAttr(self):
-        test_shadow = (
-            "cn=test,ou=People,dc=example,dc=com",
-            {
-                "uid": ["test"],
-                "name": ["test"],
-                "shadowLastChange": ["11296"],
-                "shadowMax": ["99999"],
-                "shadowWarning": ["7"],
-                "shadowInactive": ["-1"],
-                "shadowExpire": ["-1"],
-                "shadowFlag": ["134537556"],
-                "modifyTimestamp": ["20070227012807Z"],
-                "userPassword": ["{CRYPT}p4ssw0rd"],
-            },
-        )
-        config = dict(self.config)
-        config["uidattr"] = "name"
-        attrlist = [
-            "uid",
-            "shadowLastChange",
-            "shadowMin",
-            "shadowMax",
-            "shadowWarning",
-            "shadowInactive",
-            "shadowExpire",
-            "shadowFlag",
-            "userPassword",
-            "name",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_shadow], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        config = {**self.config, "uidattr": "name"}
+        attrlist = SHADOW_ATTRS + ("name", "modifyTimestamp")
+        self._SetSearchResults([TEST_SHADOW])
 
         source = ldapsource.LdapSource(config)
         data = source.GetShadowMap()
@@ -1031,87 +689,38 @@ class TestLdapSource(unittest.TestCase):
         ent = data.PopItem()
         self.assertEqual("test", ent.name)
         self.assertEqual("p4ssw0rd", ent.passwd)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist)
 
     def testGetNetgroupMap(self):
-        test_posix_netgroup = (
-            "cn=test,ou=netgroup,dc=example,dc=com",
-            {
-                "cn": ["test"],
-                "memberNisNetgroup": ["admins"],
-                "nisNetgroupTriple": ["(-,hax0r,)"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        attrlist = [
-            "cn",
-            "memberNisNetgroup",
-            "nisNetgroupTriple",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_netgroup], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
-
-        source = ldapsource.LdapSource(config)
-        data = source.GetNetgroupMap()
-
-        self.assertEqual(1, len(data))
-        ent = data.PopItem()
-        self.assertEqual("test", ent.name)
-        self.assertEqual("(-,hax0r,) admins", ent.entries)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
-
-    def testGetNetgroupMapWithDupes(self):
-        test_posix_netgroup = (
-            "cn=test,ou=netgroup,dc=example,dc=com",
-            {
-                "cn": ["test"],
-                "memberNisNetgroup": ["(-,hax0r,)"],
-                "nisNetgroupTriple": ["(-,hax0r,)"],
-                "modifyTimestamp": ["20070227012807Z"],
-            },
-        )
-        config = dict(self.config)
-        attrlist = [
-            "cn",
-            "memberNisNetgroup",
-            "nisNetgroupTriple",
-            "modifyTimestamp",
-        ]
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_posix_netgroup], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
-
-        source = ldapsource.LdapSource(config)
-        data = source.GetNetgroupMap()
-
-        self.assertEqual(1, len(data))
-        ent = data.PopItem()
-        self.assertEqual("test", ent.name)
-        self.assertEqual("(-,hax0r,)", ent.entries)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=mock.ANY,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        attrlist = NETGROUP_ATTRS + ("modifyTimestamp",)
+        # memberNisNetgroup values and the resulting entries; the second case
+        # duplicates the triple and must be collapsed.
+        cases = (
+            ("admins", "(-,hax0r,) admins"),
+            ("(-,hax0r,)", "(-,hax0r,)"),
+        )
+        for member, expected_entries in cases:
+            with self.subTest(member=member):
+                test_posix_netgroup = (
+                    "cn=test,ou=netgroup,dc=example,dc=com",
+                    {
+                        "cn": ["test"],
+                        "memberNisNetgroup": [member],
+                        "nisNetgroupTriple": ["(-,hax0r,)"],
+                        "modifyTimestamp": ["20070227012807Z"],
+                    },
+                )
+                config = dict(self.config)
+                self._SetSearchResults([test_posix_netgroup])
+
+                source = ldapsource.LdapSource(config)
+                data = source.GetNetgroupMap()
+
+                self.assertEqual(1, len(data))
+                ent = data.PopItem()
+                self.assertEqual("test", ent.name)
+                self.assertEqual(expected_entries, ent.entries)
+                self._AssertSearched(attrlist)
 
     def testGetAutomountMap(self):
         test_automount = (
@@ -1123,12 +732,9 @@ class TestLdapSource(unittest.TestCase):
             },
         )
         config = dict(self.config)
-        attrlist = ["cn", "automountInformation", "modifyTimestamp"]
+        attrlist = AUTOMOUNT_ATTRS + ("modifyTimestamp",)
         filterstr = "(objectclass=automount)"
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_automount], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        self._SetSearchResults([test_automount])
 
         source = ldapsource.LdapSource(config)
         data = source.GetAutomountMap(location="TEST_BASE")
@@ -1138,13 +744,7 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual("user", ent.key)
         self.assertEqual("-tcp,rw", ent.options)
         self.assertEqual("home:/home/user", ent.location)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=filterstr,
-            scope=mock.ANY,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist, filterstr=filterstr)
 
     def testGetAutomountMasterMap(self):
         test_master_ou = (
@@ -1162,13 +762,8 @@ class TestLdapSource(unittest.TestCase):
             },
         )
         config = dict(self.config)
-        scope = ldap.SCOPE_SUBTREE
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.side_effect = [
-            (ldap.RES_SEARCH_ENTRY, [test_master_ou], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-            (ldap.RES_SEARCH_ENTRY, [test_automount], None, []),
-            (ldap.RES_SEARCH_RESULT, None, None, []),
-        ]
+        scope = SCOPE_SUBTREE
+        self._SetSearchResults([test_master_ou], [test_automount])
 
         source = ldapsource.LdapSource(config)
         data = source.GetAutomountMasterMap()
@@ -1177,46 +772,32 @@ class TestLdapSource(unittest.TestCase):
         self.assertEqual("/home", ent.key)
         self.assertEqual("ou=auto.home,ou=automounts,dc=example,dc=com", ent.location)
         self.assertEqual(None, ent.options)
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_has_calls(
+        self.conn.search_ext.assert_has_calls(
             [
                 # first search for the dn of ou=auto.master
                 mock.call(
                     base=mock.ANY,
                     filterstr="(&(objectclass=automountMap)(ou=auto.master))",
-                    scope=ldap.SCOPE_SUBTREE,
+                    scope=SCOPE_SUBTREE,
                     attrlist=["dn"],
-                    serverctrls=self.compareSPRC(),
+                    serverctrls=SPRC_MATCHER,
                 ),
                 # then search for the entries under ou=auto.master
                 mock.call(
                     base="ou=auto.master,ou=automounts,dc=example,dc=com",
                     filterstr="(objectclass=automount)",
-                    scope=ldap.SCOPE_ONELEVEL,
-                    attrlist=[
-                        "cn",
-                        "automountInformation",
-                        "modifyTimestamp",
-                    ],
-                    serverctrls=self.compareSPRC(),
+                    scope=SCOPE_ONELEVEL,
+                    attrlist=list(AUTOMOUNT_ATTRS + ("modifyTimestamp",)),
+                    serverctrls=SPRC_MATCHER,
                 ),
             ]
         )
 
     def testVerify(self):
-        attrlist = [
-            "uid",
-            "uidNumber",
-            "gidNumber",
-            "gecos",
-            "cn",
-            "homeDirectory",
-            "loginShell",
-            "fullName",
-            "modifyTimestamp",
-        ]
+        attrlist = PASSWD_ATTRS + ("modifyTimestamp",)
         filterstr = "(&TEST_FILTER(modifyTimestamp>=19700101000001Z))"
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.return_value = (
-            ldap.RES_SEARCH_RESULT,
+        self.conn.result3.return_value = (
+            RES_SEARCH_RESULT,
             None,
             None,
             [],
@@ -1225,110 +806,73 @@ class TestLdapSource(unittest.TestCase):
         source = ldapsource.LdapSource(self.config)
 
         self.assertEqual(0, source.Verify(0))
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=filterstr,
-            scope=ldap.SCOPE_ONELEVEL,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
+        self._AssertSearched(attrlist, filterstr=filterstr, scope=SCOPE_ONELEVEL)
 
     def testVerifyRID(self):
-        attrlist = [
-            "uid",
-            "uidNumber",
-            "gidNumber",
-            "gecos",
-            "cn",
-            "homeDirectory",
-            "loginShell",
-            "fullName",
-            "sambaSID",
-            "modifyTimestamp",
-        ]
+        attrlist = PASSWD_ATTRS + ("sambaSID", "modifyTimestamp")
         filterstr = "(&TEST_FILTER(modifyTimestamp>=19700101000001Z))"
-        self.ldap_mock.ReconnectLDAPObject.return_value.result3.return_value = (
-            ldap.RES_SEARCH_RESULT,
+        self.conn.result3.return_value = (
+            RES_SEARCH_RESULT,
             None,
             None,
             [],
         )
-        config = dict(self.config)
-        config["use_rid"] = 1
+        config = {**self.config, "use_rid": 1}
 
         source = ldapsource.LdapSource(config)
 
         self.assertEqual(0, source.Verify(0))
-        self.ldap_mock.ReconnectLDAPObject.return_value.search_ext.assert_called_with(
-            base=mock.ANY,
-            filterstr=filterstr,
-            scope=ldap.SCOPE_ONELEVEL,
-            attrlist=attrlist,
-            serverctrls=self.compareSPRC(),
-        )
-
-
-class TestUpdateGetter(unittest.TestCase):
-    def setUp(self):
-        """Create a dummy source object."""
-        super(TestUpdateGetter, self).setUp()
-
-        class DummySource(list):
-            """Dummy Source class for this test.
-
-            Inherits from list as Sources are iterables.
-            """
-
-            def Search(self, search_base, search_filter, search_scope, attrs):
-                pass
+        self._AssertSearched(attrlist, filterstr=filterstr, scope=SCOPE_ONELEVEL)
 
-        self.source = DummySource()
-
-    def testFromTimestampToLdap(self):
-        ts = 1259641025
-        expected_ldap_ts = "20091201041705Z"
-        self.assertEqual(
-            expected_ldap_ts, ldapsource.UpdateGetter({}).FromTimestampToLdap(ts)
-        )
 
-    def testFromLdapToTimestamp(self):
-        expected_ts = 1259641025
-        ldap_ts = "20091201041705Z"
-        self.assertEqual(
-            expected_ts, ldapsource.UpdateGetter({}).FromLdapToTimestamp(ldap_ts)
-        )
+# UpdateGetter classes and the map type they return.
+EMPTY_SOURCE_GETTERS = (
+    (ldapsource.PasswdUpdateGetter, passwd.PasswdMap),
+    (ldapsource.GroupUpdateGetter, group.GroupMap),
+    (ldapsource.ShadowUpdateGetter, shadow.ShadowMap),
+    (ldapsource.AutomountUpdateGetter, automount.AutomountMap),
+)
 
-    def testPasswdEmptySourceGetUpdates(self):
-        """Test that getUpdates on the PasswdUpdateGetter works."""
-        getter = ldapsource.PasswdUpdateGetter({})
+# The timestamp converters are stateless and work in UTC (gmtime/timegm), so one
+# getter serves both round-trip tests.
+TIMESTAMP_GETTER = ldapsource.UpdateGetter({})
+TS = 1259641025
+LDAP_TS = "20091201041705Z"
 
-        data = getter.GetUpdates(self.source, "TEST_BASE", "TEST_FILTER", "base", None)
 
-        self.assertEqual(passwd.PasswdMap, type(data))
+class DummySource(list):
+    """Dummy Source class for the UpdateGetter tests.
 
-    def testGroupEmptySourceGetUpdates(self):
-        """Test that getUpdates on the GroupUpdateGetter works."""
-        getter = ldapsource.GroupUpdateGetter({})
+    Inherits from list as Sources are iterables.
+    """
 
-        data = getter.GetUpdates(self.source, "TEST_BASE", "TEST_FILTER", "base", None)
+    def Search(self, search_base, search_filter, search_scope, attrs):
+        pass
 
-        self.assertEqual(group.GroupMap, type(data))
 
-    def testShadowEmptySourceGetUpdates(self):
-        """Test that getUpdates on the ShadowUpdateGetter works."""
-        getter = ldapsource.ShadowUpdateGetter({})
+class TestUpdateGetter(unittest.TestCase):
+    def setUp(self):
+        """Create a dummy source object."""
+        super(TestUpdateGetter, self).setUp()
+        self.source = DummySource()
 
-        data = getter.GetUpdates(self.source, "TEST_BASE", "TEST_FILTER", "base", None)
+    def testFromTimestampToLdap(self):
+        self.assertEqual(LDAP_TS, TIMESTAMP_GETTER.FromTimestampToLdap(TS))
 
-        self.assertEqual(shadow.ShadowMap, type(data))
+    def testFromLdapToTimestamp(self):
+        self.assertEqual(TS, TIMESTAMP_GETTER.FromLdapToTimestamp(LDAP_TS))
 
-    def testAutomountEmptySourceGetsUpdates(self):
-        """Test that getUpdates on the AutomountUpdateGetter works."""
-        getter = ldapsource.AutomountUpdateGetter({})
+    def testEmptySourceGetUpdates(self):
+        """Test that GetUpdates on each UpdateGetter works on an empty source."""
+        for getter_class, map_class in EMPTY_SOURCE_GETTERS:
+            with self.subTest(getter=getter_class.__name__):
+                getter = getter_class({})
 
-        data = getter.GetUpdates(self.source, "TEST_BASE", "TEST_FILTER", "base", None)
+                data = getter.GetUpdates(
+                    self.source, "TEST_BASE", "TEST_FILTER", "base", None
+                )
 
-        self.assertEqual(automount.AutomountMap, type(data))
+                self.assertIs(map_class, type(data))
 
     def testBadScopeException(self):
         """Test that a bad scope raises a config.ConfigurationError."""
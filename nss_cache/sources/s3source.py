@@ -8,6 +8,7 @@ import logging
 import json
 import datetime
 import boto3
+from botocore.client import Config
 from botocore.exceptions import ClientError
 
 from nss_cache.maps import group
@@ -18,11 +19,49 @@ from nss_cache.sources import source
 from nss_cache.util import timestamps
 from nss_cache import error
 
+try:
+    import ijson
+except ImportError:
+    # Fall back to parsing the whole object in one go.
+    ijson = None
+
+# Values used when a record leaves the field out.
+_DEFAULT_PASSWD = "x"
+_DEFAULT_SHADOW_PASSWD = "*"
+_DEFAULT_SHELL = "/bin/bash"
+
+# Integer fields of a shadow record, in /etc/shadow order.
+_SHADOW_INT_FIELDS = ("lstchg", "min", "max", "warn", "inact", "expire")
+
 
 def RegisterImplementation(registration_callback):
     registration_callback(S3FilesSource)
 
 
+def _ToInt(value):
+    """Return value as an int, skipping the conversion for JSON numbers."""
+    return value if type(value) is int else int(value)
+
+
+def _GetIjsonBackend():
+    """Return a C ijson backend, or None to parse with json.loads instead.
+
+    ijson's pure Python backend is several times slower than json.loads, so
+    streaming is only worth its lower peak memory with a C backend.
+    """
+    if ijson is None:
+        return None
+    for name in ("yajl2_c", "yajl2_cffi"):
+        try:
+            return ijson.get_backend(name)
+        except ImportError:
+            continue
+    return None
+
+
+_ijson_backend = _GetIjsonBackend()
+
+
 class S3FilesSource(source.Source):
     """Source for data fetched from S3."""
 
@@ -36,6 +75,10 @@ class S3FilesSource(source.Source):
     # for registration
     name = "s3"
 
+    # One client (and so one connection pool) is shared by every instance,
+    # letting the per-map fetches of a run reuse established connections.
+    _s3_client = None
+
     def __init__(self, conf):
         """Initialise the S3FilesSource object.
 
@@ -47,12 +90,17 @@ class S3FilesSource(source.Source):
         """
         super(S3FilesSource, self).__init__(conf)
         self._SetDefaults(conf)
-        self.s3_client = None
 
     def _GetClient(self):
-        if self.s3_client is None:
-            self.s3_client = boto3.client("s3")
-        return self.s3_client
+        if S3FilesSource._s3_client is None:
+            S3FilesSource._s3_client = boto3.session.Session().client(
+                "s3",
+                config=Config(
+                    retries={"max_attempts": 3, "mode": "standard"},
+                    tcp_keepalive=True,
+                ),
+            )
+        return S3FilesSource._s3_client
 
     def _SetDefaults(self, configuration):
         """Set defaults if necessary."""
@@ -161,8 +209,10 @@ class S3UpdateGetter(object):
                 response["LastModified"]
             )
         except ClientError as e:
-            error_code = int(e.response["Error"]["Code"])
-            if error_code == 304:
+            # Error codes are not always numeric (e.g. "NoSuchKey"), so go by
+            # the HTTP status to spot an unchanged object.
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if status == 304:
                 return []
             self.log.error("error getting S3 object ({}): {}".format(obj, e))
             raise error.SourceUnavailable("unable to download object from S3")
@@ -248,16 +298,39 @@ class S3MapParser(object):
     def __init__(self):
         self.log = logging.getLogger(__name__)
 
+    def _ReadObjects(self, cache_info):
+        """Yields the objects of the JSON array in a cache.
+
+        Args:
+          cache_info: binary file like object containing the cache.
+
+        Raises:
+          ValueError: the cache is not valid JSON.
+        """
+        if _ijson_backend is None:
+            yield from json.loads(cache_info.read())
+            return
+        # Stream the top level array so entries are built as the body
+        # arrives rather than after it has all been read into memory.
+        try:
+            yield from _ijson_backend.items(cache_info, "item")
+        except ijson.JSONError as e:
+            # Match the ValueError raised by json.loads.
+            raise ValueError("malformed JSON in cache: %s" % e) from e
+
     def GetMap(self, cache_info, data):
         """Returns a map from a cache.
 
         Args:
-          cache_info: file like object containing the cache.
+          cache_info: binary file like object containing the cache.
           data: a Map to populate.
         Returns:
           A child of Map containing the cache data.
+
+        Raises:
+          ValueError: the cache is not valid JSON.
         """
-        for obj in json.loads(cache_info.read()):
+        for obj in self._ReadObjects(cache_info):
             key = obj.get("Key", "")
             value = obj.get("Value", "")
             if not value or not key:
@@ -286,17 +359,21 @@ class S3PasswdMapParser(S3MapParser):
         map_entry = passwd.PasswdMapEntry()
         # maps expect strict typing, so convert to int as appropriate.
         map_entry.name = name
-        map_entry.passwd = entry.get("passwd", "x")
+        map_entry.passwd = entry.get("passwd", _DEFAULT_PASSWD)
 
         try:
-            map_entry.uid = int(entry["uid"])
-            map_entry.gid = int(entry["gid"])
+            map_entry.uid = _ToInt(entry["uid"])
+            map_entry.gid = _ToInt(entry["gid"])
         except (ValueError, KeyError):
             return None
 
         map_entry.gecos = entry.get("comment", "")
-        map_entry.dir = entry.get("home", "/home/{}".format(name))
-        map_entry.shell = entry.get("shell", "/bin/bash")
+        # Only build the default home directory when the record lacks one.
+        if "home" in entry:
+            map_entry.dir = entry["home"]
+        else:
+            map_entry.dir = "/home/{}".format(name)
+        map_entry.shell = entry.get("shell", _DEFAULT_SHELL)
 
         return map_entry
 
@@ -324,17 +401,24 @@ class S3GroupMapParser(S3MapParser):
         map_entry = group.GroupMapEntry()
         # map entries expect strict typing, so convert as appropriate
         map_entry.name = name
-        map_entry.passwd = entry.get("passwd", "x")
+        map_entry.passwd = entry.get("passwd", _DEFAULT_PASSWD)
 
         try:
-            map_entry.gid = int(entry["gid"])
+            map_entry.gid = _ToInt(entry["gid"])
         except (ValueError, KeyError):
             return None
 
-        try:
-            members = entry.get("members", "").split("\n")
-        except (ValueError, TypeError):
-            members = [""]
+        members = entry.get("members", "")
+        if isinstance(members, list):
+            # Producers may emit members as a JSON array, which needs no
+            # splitting.  Keep the [""] of an empty split so entries compare
+            # equal to those read back from the files cache.
+            members = members or [""]
+        else:
+            try:
+                members = members.split("\n")
+            except (ValueError, TypeError):
+                members = [""]
         map_entry.members = members
         return map_entry
 
@@ -348,11 +432,11 @@ class S3ShadowMapParser(S3MapParser):
         map_entry = shadow.ShadowMapEntry()
         # maps expect strict typing, so convert to int as appropriate.
         map_entry.name = name
-        map_entry.passwd = entry.get("passwd", "*")
+        map_entry.passwd = entry.get("passwd", _DEFAULT_SHADOW_PASSWD)
 
-        for attr in ["lstchg", "min", "max", "warn", "inact", "expire"]:
+        for attr in _SHADOW_INT_FIELDS:
             try:
-                setattr(map_entry, attr, int(entry[attr]))
+                setattr(map_entry, attr, _ToInt(entry[attr]))
             except (ValueError, KeyError):
                 continue
 
@@ -2,9 +2,12 @@
 
 __author__ = "alexey.pikin@gmail.com"
 
+import json
 import unittest
-from io import StringIO
+from io import BytesIO
+from unittest import mock
 
+from nss_cache import error
 from nss_cache.maps import group
 from nss_cache.maps import passwd
 from nss_cache.maps import shadow
@@ -38,6 +41,44 @@ class TestS3Source(unittest.TestCase):
         self.assertEqual(source.conf["passwd_object"], "PASSWD_OBJ")
         self.assertEqual(source.conf["group_object"], "GROUP_OBJ")
 
+    @mock.patch.object(s3source.S3FilesSource, "_s3_client", None)
+    @mock.patch.object(s3source.boto3.session, "Session", autospec=True)
+    def testClientSharedBetweenSources(self, session_mock):
+        first = s3source.S3FilesSource({})._GetClient()
+        second = s3source.S3FilesSource(self.config)._GetClient()
+        self.assertIs(first, second)
+        session_mock.return_value.client.assert_called_once()
+
+
+class TestS3UpdateGetter(unittest.TestCase):
+    def _ClientError(self, code, status):
+        return s3source.ClientError(
+            {
+                "Error": {"Code": code, "Message": "TEST_MESSAGE"},
+                "ResponseMetadata": {"HTTPStatusCode": status},
+            },
+            "GetObject",
+        )
+
+    def testNotModified(self):
+        client = mock.Mock()
+        client.get_object.side_effect = self._ClientError("304", 304)
+        getter = s3source.PasswdUpdateGetter()
+        self.assertEqual([], getter.GetUpdates(client, "TEST_BUCKET", "PASSWD_OBJ", 1))
+
+    def testNonNumericErrorCode(self):
+        client = mock.Mock()
+        client.get_object.side_effect = self._ClientError("NoSuchKey", 404)
+        getter = s3source.PasswdUpdateGetter()
+        self.assertRaises(
+            error.SourceUnavailable,
+            getter.GetUpdates,
+            client,
+            "TEST_BUCKET",
+            "PASSWD_OBJ",
+            None,
+        )
+
 
 class TestPasswdMapParser(unittest.TestCase):
     def setUp(self):
@@ -54,8 +95,8 @@ class TestPasswdMapParser(unittest.TestCase):
 
     def testGetMap(self):
         passwd_map = passwd.PasswdMap()
-        cache_info = StringIO(
-            """[
+        cache_info = BytesIO(
+            b"""[
                             { "Key": "foo",
                               "Value": {
                                "uid": 10, "gid": 10, "home": "/home/foo",
@@ -68,6 +109,60 @@ class TestPasswdMapParser(unittest.TestCase):
         self.parser.GetMap(cache_info, passwd_map)
         self.assertEqual(self.good_entry, passwd_map.PopItem())
 
+    @mock.patch.object(s3source, "_ijson_backend", None)
+    def testGetMapWithoutIjson(self):
+        passwd_map = passwd.PasswdMap()
+        cache_info = BytesIO(
+            b"""[
+                 { "Key": "foo",
+                   "Value": {
+                    "uid": 10, "gid": 10, "home": "/home/foo",
+                    "shell": "/bin/bash", "comment": "How Now Brown Cow"
+                   }
+                 }
+               ]"""
+        )
+        self.parser.GetMap(cache_info, passwd_map)
+        self.assertEqual(self.good_entry, passwd_map.PopItem())
+
+    @unittest.skipIf(s3source.ijson is None, "ijson is not installed")
+    def testPurePythonIjsonFallsBackToJson(self):
+        # Only the pure Python backend loads, as on a host without yajl.
+        with mock.patch.object(
+            s3source.ijson, "get_backend", side_effect=ImportError
+        ) as get_backend:
+            backend = s3source._GetIjsonBackend()
+        self.assertIsNone(backend)
+        self.assertEqual(
+            [mock.call("yajl2_c"), mock.call("yajl2_cffi")],
+            get_backend.call_args_list,
+        )
+
+        passwd_map = passwd.PasswdMap()
+        cache_info = BytesIO(
+            b'[{"Key": "foo", "Value": {"uid": 10, "gid": 10,'
+            b' "comment": "How Now Brown Cow"}}]'
+        )
+        with mock.patch.object(s3source, "_ijson_backend", backend), mock.patch.object(
+            s3source.json, "loads", wraps=json.loads
+        ) as loads:
+            self.parser.GetMap(cache_info, passwd_map)
+        loads.assert_called_once()
+        self.assertEqual(self.good_entry, passwd_map.PopItem())
+
+    def testGetMapMalformed(self):
+        # Both the whole-document and the streaming parser report ValueError.
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                if streaming and s3source._ijson_backend is None:
+                    self.skipTest("no C ijson backend")
+                backend = s3source._ijson_backend if streaming else None
+                with mock.patch.object(s3source, "_ijson_backend", backend):
+                    cache_info = BytesIO(b'[{"Key": "foo", "Value": {"uid": 10,')
+                    self.assertRaises(
+                        ValueError, self.parser.GetMap, cache_info, passwd.PasswdMap()
+                    )
+
     def testReadEntry(self):
         data = {
             "uid": "10",
@@ -105,8 +200,8 @@ class TestS3GroupMapParser(unittest.TestCase):
 
     def testGetMap(self):
         group_map = group.GroupMap()
-        cache_info = StringIO(
-            """[
+        cache_info = BytesIO(
+            b"""[
                             { "Key": "foo",
                               "Value": {
                                "gid": 10,
@@ -134,6 +229,16 @@ class TestS3GroupMapParser(unittest.TestCase):
         entry = self.parser._ReadEntry("foo", data)
         self.assertEqual(entry.members, [""])
 
+    def testMembersArray(self):
+        data = {"gid": "10", "members": ["foo", "bar"]}
+        entry = self.parser._ReadEntry("foo", data)
+        self.assertEqual(entry.members, ["foo", "bar"])
+
+    def testEmptyMembersArray(self):
+        data = {"gid": "10", "members": []}
+        entry = self.parser._ReadEntry("foo", data)
+        self.assertEqual(entry.members, [""])
+
     def testInvalidEntry(self):
         data = {"irrelevant_key": "bacon"}
         entry = self.parser._ReadEntry("foo", data)
@@ -153,8 +258,8 @@ class TestS3ShadowMapParser(unittest.TestCase):
 
     def testGetMap(self):
         shadow_map = shadow.ShadowMap()
-        cache_info = StringIO(
-            """[
+        cache_info = BytesIO(
+            b"""[
                             { "Key": "foo",
                               "Value": {
                                "passwd": "*", "lstchg": 17246, "min": 0,
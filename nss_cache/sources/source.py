@@ -31,6 +31,15 @@ class Source(object):
 
     UPDATER = None
 
+    # Map name to the name of the method that fetches it.
+    _MAP_GETTERS = {
+        config.MAP_PASSWORD: "GetPasswdMap",
+        config.MAP_SSHKEY: "GetSshkeyMap",
+        config.MAP_GROUP: "GetGroupMap",
+        config.MAP_SHADOW: "GetShadowMap",
+        config.MAP_NETGROUP: "GetNetgroupMap",
+    }
+
     def __init__(self, conf):
         """Initialise the Source object.
 
@@ -62,20 +71,13 @@ class Source(object):
         Raises:
           UnsupportedMap: for unknown source maps
         """
-        if map_name == config.MAP_PASSWORD:
-            return self.GetPasswdMap(since)
-        elif map_name == config.MAP_SSHKEY:
-            return self.GetSshkeyMap(since)
-        elif map_name == config.MAP_GROUP:
-            return self.GetGroupMap(since)
-        elif map_name == config.MAP_SHADOW:
-            return self.GetShadowMap(since)
-        elif map_name == config.MAP_NETGROUP:
-            return self.GetNetgroupMap(since)
-        elif map_name == config.MAP_AUTOMOUNT:
+        if map_name == config.MAP_AUTOMOUNT:
             return self.GetAutomountMap(since, location=location)
 
-        raise error.UnsupportedMap("Source can not fetch %s" % map_name)
+        getter = self._MAP_GETTERS.get(map_name)
+        if getter is None:
+            raise error.UnsupportedMap("Source can not fetch %s" % map_name)
+        return getattr(self, getter)(since)
 
     def GetAutomountMap(self, since=None, location=None):
         """Get an automount map from this source."""
@@ -97,6 +99,14 @@ class Source(object):
 class FileSource(object):
     """Abstract base class for file data sources."""
 
+    # Map name to the name of the method that fetches its file.
+    _FILE_GETTERS = {
+        config.MAP_PASSWORD: "GetPasswdFile",
+        config.MAP_GROUP: "GetGroupFile",
+        config.MAP_SHADOW: "GetShadowFile",
+        config.MAP_NETGROUP: "GetNetgroupFile",
+    }
+
     def __init__(self, conf):
         """Initialise the Source object.
 
@@ -129,15 +139,10 @@ class FileSource(object):
         Raises:
           UnsupportedMap: for unknown source maps
         """
-        if map_name == config.MAP_PASSWORD:
-            return self.GetPasswdFile(dst_file, current_file)
-        elif map_name == config.MAP_GROUP:
-            return self.GetGroupFile(dst_file, current_file)
-        elif map_name == config.MAP_SHADOW:
-            return self.GetShadowFile(dst_file, current_file)
-        elif map_name == config.MAP_NETGROUP:
-            return self.GetNetgroupFile(dst_file, current_file)
-        elif map_name == config.MAP_AUTOMOUNT:
+        if map_name == config.MAP_AUTOMOUNT:
             return self.GetAutomountFile(dst_file, current_file, location=location)
 
-        raise error.UnsupportedMap("Source can not fetch %s" % map_name)
+        getter = self._FILE_GETTERS.get(map_name)
+        if getter is None:
+            raise error.UnsupportedMap("Source can not fetch %s" % map_name)
+        return getattr(self, getter)(dst_file, current_file)
@@ -18,7 +18,10 @@
 __author__ = "jaq@google.com (Jamie Wilkinson)"
 
 import unittest
+from unittest import mock
 
+from nss_cache import config
+from nss_cache import error
 from nss_cache.sources import source
 
 
@@ -41,6 +44,40 @@ class TestSource(unittest.TestCase):
         s = source.Source({})
         self.assertRaises(NotImplementedError, s.Verify)
 
+    def testGetMap(self):
+        s = source.Source({})
+        s.GetGroupMap = mock.Mock(return_value="GROUP_MAP")
+        self.assertEqual("GROUP_MAP", s.GetMap(config.MAP_GROUP, since=1))
+        s.GetGroupMap.assert_called_once_with(1)
+
+    def testGetMapAutomountLocation(self):
+        s = source.Source({})
+        s.GetAutomountMap = mock.Mock(return_value="AUTOMOUNT_MAP")
+        self.assertEqual(
+            "AUTOMOUNT_MAP", s.GetMap(config.MAP_AUTOMOUNT, location="/home")
+        )
+        s.GetAutomountMap.assert_called_once_with(None, location="/home")
+
+    def testGetMapUnsupported(self):
+        s = source.Source({})
+        self.assertRaises(error.UnsupportedMap, s.GetMap, "TEST_MAP")
+
+
+class TestFileSource(unittest.TestCase):
+    """Unit tests for the FileSource class."""
+
+    def testGetFile(self):
+        s = source.FileSource({})
+        s.GetShadowFile = mock.Mock(return_value="SHADOW_FILE")
+        self.assertEqual(
+            "SHADOW_FILE", s.GetFile(config.MAP_SHADOW, "DST_FILE", "CURRENT_FILE")
+        )
+        s.GetShadowFile.assert_called_once_with("DST_FILE", "CURRENT_FILE")
+
+    def testGetFileUnsupported(self):
+        s = source.FileSource({})
+        self.assertRaises(error.UnsupportedMap, s.GetFile, "TEST_MAP", "DST", "CUR")
+
 
 if __name__ == "__main__":
     unittest.main()
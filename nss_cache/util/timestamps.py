@@ -135,7 +135,9 @@ def FromTimestampToDateTime(ts):
     Returns:
       datetime object
     """
-    return datetime.datetime.utcfromtimestamp(ts)
+    # utcfromtimestamp() is deprecated; keep returning a naive UTC datetime.
+    dt = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
+    return dt.replace(tzinfo=None)
 
 
 def FromDateTimeToTimestamp(datetime_obj):
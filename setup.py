@@ -55,11 +55,11 @@ as LDAP.""",
     data_files=[("config", ["nsscache.conf"])],
     python_requires="~=3.4",
     setup_requires=["pytest-runner"],
-    tests_require=["pytest", "mox3", "pytest-cov", "python-coveralls"],
+    tests_require=["pytest", "pytest-cov", "python-coveralls"],
     extras_require={
         "ldap": ["python3-ldap", "python-ldap"],
         "http": ["pycurl"],
-        "s3": ["boto3"],
+        "s3": ["boto3", "ijson"],
         "consul": ["pycurl"],
         "gcs": ["google-cloud-storage"],
     },